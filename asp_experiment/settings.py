@@ -12,22 +12,31 @@ from pathlib import Path
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 
-def _env_bool(name: str, default: bool) -> bool:
-    val = os.getenv(name)
+# Read the environment once; everything below parses this snapshot.
+_ENV = os.environ.copy()
+
+
+def _env_bool(name: str, default: bool, env: dict[str, str] = _ENV) -> bool:
+    val = env.get(name)
     if val is None:
         return default
     return val.strip().lower() in {"1", "true", "yes", "y", "on"}
 
+
+def _env_list(name: str, default: str, env: dict[str, str] = _ENV) -> tuple[str, ...]:
+    return tuple(item for raw in env.get(name, default).split(",") if (item := raw.strip()))
+
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = os.getenv("DJANGO_SECRET_KEY", "unsafe-dev-secret")
+SECRET_KEY = _ENV.get("DJANGO_SECRET_KEY", "unsafe-dev-secret")
 
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = _env_bool("DJANGO_DEBUG", False)
 
-_allowed_hosts = os.getenv("DJANGO_ALLOWED_HOSTS", "localhost,127.0.0.1")
-ALLOWED_HOSTS = [h.strip() for h in _allowed_hosts.split(",") if h.strip()]
-_csrf_trusted = os.getenv("DJANGO_CSRF_TRUSTED_ORIGINS", "")
-CSRF_TRUSTED_ORIGINS = [o.strip() for o in _csrf_trusted.split(",") if o.strip()]
+ALLOWED_HOSTS = _env_list("DJANGO_ALLOWED_HOSTS", "localhost,127.0.0.1")
+CSRF_TRUSTED_ORIGINS = _env_list("DJANGO_CSRF_TRUSTED_ORIGINS", "")
+
+# Frame batch ingest: validate in the request, write from a background thread (HTTP 202).
+FRAME_INGEST_ASYNC = _env_bool("DJANGO_FRAME_INGEST_ASYNC", False)
 
 
 # Application definition
@@ -80,7 +89,12 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         # Persist DB outside image by setting DJANGO_SQLITE_PATH=/app/data/db.sqlite3
-        'NAME': os.getenv("DJANGO_SQLITE_PATH") or (BASE_DIR / 'db.sqlite3'),
+        'NAME': _ENV.get("DJANGO_SQLITE_PATH") or (BASE_DIR / 'db.sqlite3'),
+        'OPTIONS': {
+            # Applied on every new connection. WAL lets the telemetry pollers write while
+            # pages/APIs read; synchronous=NORMAL is safe with WAL and avoids an fsync per commit.
+            'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL; PRAGMA temp_store=MEMORY;',
+        },
     }
 }
 
@@ -1,15 +1,24 @@
+import functools
+import select
 import time
 from dataclasses import dataclass
 
+_HAS_POLL = hasattr(select, "poll")
+# Port read timeout: non-blocking when poll() does the waiting, otherwise a short blocking read.
+SERIAL_READ_TIMEOUT_S = 0 if _HAS_POLL else 0.05
 
-@dataclass(frozen=True)
+
+@dataclass(frozen=True, slots=True)
 class ArduinoResult:
     ok: bool
     confirmed: bool
     response_lines: list[str]
     error: str | None = None
+    # The port was held by another caller (or still opening) past the caller's lock timeout.
+    busy: bool = False
 
 
+@functools.cache
 def _try_import_pyserial():
     try:
         import serial  # type: ignore
@@ -18,6 +27,51 @@ def _try_import_pyserial():
     return serial
 
 
+def _decode_lines(lines: list[bytes]) -> list[str]:
+    # Lines are kept as raw bytes while scanning; decode once when building the result.
+    return [raw.decode("utf-8", errors="replace") for raw in lines]
+
+
+class _LineReader:
+    """
+    Reads newline-terminated lines from an open pyserial port.
+
+    Sleeps in poll() until bytes arrive or the deadline passes, then reads everything
+    pyserial reports as pending in one call. Partial lines stay buffered between calls.
+    """
+
+    def __init__(self, ser):
+        self._ser = ser
+        self._buf = bytearray()
+        self._poll = None
+        if _HAS_POLL:
+            self._poll = select.poll()
+            self._poll.register(ser.fileno(), select.POLLIN)
+
+    def read_line(self, deadline: float) -> bytes | None:
+        """
+        Return the next non-empty stripped line, or None once `deadline` (time.monotonic()) passes.
+        """
+        buf = self._buf
+        while True:
+            nl = buf.find(b"\n")
+            while nl >= 0:
+                raw = bytes(buf[:nl]).strip()
+                del buf[: nl + 1]
+                if raw:
+                    return raw
+                nl = buf.find(b"\n")
+
+            remaining_ms = int((deadline - time.monotonic()) * 1000)
+            if remaining_ms <= 0:
+                return None
+            if self._poll is not None and not self._poll.poll(remaining_ms):
+                continue
+            chunk = self._ser.read(self._ser.in_waiting or 1)
+            if chunk:
+                buf.extend(chunk)
+
+
 def send_command_and_wait_ack(
     *,
     port: str,
@@ -46,10 +100,10 @@ def send_command_and_wait_ack(
     if not port:
         return ArduinoResult(ok=False, confirmed=False, response_lines=[], error="Serial port is empty.")
 
-    lines: list[str] = []
+    lines: list[bytes] = []
 
     try:
-        with serial.Serial(port=port, baudrate=baud_rate, timeout=0.1) as ser:
+        with serial.Serial(port=port, baudrate=baud_rate, timeout=SERIAL_READ_TIMEOUT_S) as ser:
             # Many Arduino boards reset when the port is opened. Give them time to boot,
             # otherwise the first command is often missed.
             if startup_delay_s > 0:
@@ -58,23 +112,21 @@ def send_command_and_wait_ack(
             ser.write((command + write_line_ending).encode("utf-8", errors="replace"))
             ser.flush()
 
-            start = time.monotonic()
-            while time.monotonic() - start < timeout_s:
-                raw = ser.readline()
-                if not raw:
-                    continue
-                line = raw.decode("utf-8", errors="replace").strip()
-                if not line:
-                    continue
-                lines.append(line)
-
-                upper = line.upper()
-                if "ERR" in upper:
-                    return ArduinoResult(ok=False, confirmed=False, response_lines=lines, error=line)
-                if "OK" in upper:
-                    return ArduinoResult(ok=True, confirmed=True, response_lines=lines)
-
-            return ArduinoResult(ok=False, confirmed=False, response_lines=lines, error="Timeout waiting for ACK.")
+            reader = _LineReader(ser)
+            deadline = time.monotonic() + timeout_s
+            while (raw := reader.read_line(deadline)) is not None:
+                lines.append(raw)
+
+                upper = raw.upper()
+                if b"ERR" in upper:
+                    decoded = _decode_lines(lines)
+                    return ArduinoResult(ok=False, confirmed=False, response_lines=decoded, error=decoded[-1])
+                if b"OK" in upper:
+                    return ArduinoResult(ok=True, confirmed=True, response_lines=_decode_lines(lines))
+
+            return ArduinoResult(
+                ok=False, confirmed=False, response_lines=_decode_lines(lines), error="Timeout waiting for ACK."
+            )
     except Exception as exc:
-        return ArduinoResult(ok=False, confirmed=False, response_lines=lines, error=str(exc))
+        return ArduinoResult(ok=False, confirmed=False, response_lines=_decode_lines(lines), error=str(exc))
 
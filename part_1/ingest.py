@@ -0,0 +1,141 @@
+"""
+Optional background writer for frame batch ingest (DJANGO_FRAME_INGEST_ASYNC=1).
+
+The ingest view validates the payload, queues the rows and answers 202 immediately;
+a single writer thread drains the queue and coalesces several POSTs into one transaction.
+Dropped rows are logged; on worker exit the writer is asked to flush what is still queued.
+"""
+
+from __future__ import annotations
+
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from django.db import IntegrityError, InterfaceError, OperationalError, close_old_connections, connection
+
+from .models import Frame
+
+logger = logging.getLogger(__name__)
+
+# Max queued POST batches before the view starts answering 503.
+QUEUE_MAXSIZE = 10000
+# The writer keeps pulling queued batches until it has at least this many rows.
+WRITE_BATCH_ROWS = 1000
+# How long interpreter shutdown waits for the writer to flush what is still queued.
+SHUTDOWN_FLUSH_TIMEOUT_S = 5.0
+# Backoff before each retry of an insert that failed transiently (e.g. SQLite "database is locked"
+# while a poller writes); these rows were already acknowledged with 202.
+WRITE_RETRY_DELAYS_S = (0.1, 0.5, 2.0)
+
+# None is the stop sentinel put by _shutdown().
+_queue: queue.Queue[list[tuple] | None] = queue.Queue(maxsize=QUEUE_MAXSIZE)
+_writer_lock = threading.Lock()
+_writer: threading.Thread | None = None
+
+
+def enqueue_frame_rows(rows: list[tuple]) -> bool:
+    """
+    Queue validated rows (Frame.INSERT_COLUMNS order). Returns False if the queue is full.
+    """
+    _ensure_writer_running()
+    try:
+        _queue.put_nowait(rows)
+    except queue.Full:
+        return False
+    return True
+
+
+def _ensure_writer_running() -> None:
+    global _writer
+    if _writer is not None:
+        return
+    with _writer_lock:
+        if _writer is None:
+            _writer = threading.Thread(target=_run, name="frame-ingest-writer", daemon=True)
+            _writer.start()
+            atexit.register(_shutdown)
+
+
+def _shutdown() -> None:
+    # Clients already got 202 for queued rows: on worker exit let the writer flush them
+    # instead of losing them with the daemon thread, and report whatever is left.
+    writer = _writer
+    if writer is None:
+        return
+    if writer.is_alive():
+        try:
+            _queue.put(None, timeout=SHUTDOWN_FLUSH_TIMEOUT_S)
+        except queue.Full:
+            pass
+        writer.join(SHUTDOWN_FLUSH_TIMEOUT_S)
+
+    lost = 0
+    try:
+        while True:
+            rows = _queue.get_nowait()
+            lost += len(rows or ())
+    except queue.Empty:
+        pass
+    if lost:
+        logger.error("Frame ingest writer stopped with %d queued rows not written.", lost)
+
+
+def _run() -> None:
+    try:
+        while True:
+            first = _queue.get()
+            if first is None:
+                return
+            batches = [first]
+            n = len(first)
+            stop = False
+            try:
+                while n < WRITE_BATCH_ROWS:
+                    rows = _queue.get_nowait()
+                    if rows is None:
+                        stop = True
+                        break
+                    batches.append(rows)
+                    n += len(rows)
+            except queue.Empty:
+                pass
+
+            close_old_connections()
+            try:
+                _write(batches)
+            except Exception:
+                # Keep the writer alive; transient errors were already retried in _insert().
+                logger.exception("Frame ingest writer dropped %d rows after a database error.", n)
+            if stop:
+                return
+    finally:
+        connection.close()
+
+
+def _insert(rows: list[tuple]) -> None:
+    for delay in WRITE_RETRY_DELAYS_S:
+        try:
+            Frame.bulk_insert_rows(rows)
+            return
+        except OperationalError:
+            pass
+        except InterfaceError:
+            # The connection itself is broken; the next query opens a new one.
+            connection.close()
+        time.sleep(delay)
+    Frame.bulk_insert_rows(rows)
+
+
+def _write(batches: list[list[tuple]]) -> None:
+    try:
+        _insert([row for rows in batches for row in rows])
+    except IntegrityError:
+        # An experiment was deleted after its POST was accepted: keep the other batches.
+        for rows in batches:
+            try:
+                _insert(rows)
+            except IntegrityError:
+                logger.warning("Frame ingest writer dropped a batch of %d rows: integrity error.", len(rows))
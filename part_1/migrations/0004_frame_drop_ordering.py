@@ -0,0 +1,21 @@
+# Generated by Django 6.0.1 on 2026-10-15 02:13
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('part_1', '0003_experiment_refactor'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='frame',
+            options={},
+        ),
+        migrations.RemoveIndex(
+            model_name='frame',
+            name='part_1_fram_experim_793b17_idx',
+        ),
+    ]
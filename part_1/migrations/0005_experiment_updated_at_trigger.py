@@ -0,0 +1,47 @@
+# Generated by Django 6.0.1 on 2026-10-15 02:20
+
+from django.db import migrations
+
+TRIGGER_NAME = "part_1_experement_touch_updated_at"
+
+
+def create_trigger(apps, schema_editor):
+    """
+    SQLite: bump updated_at on every UPDATE that doesn't set it explicitly
+    (queryset.update(), save(update_fields=[...]) without updated_at, raw SQL).
+
+    Note: SQLite drops triggers together with the table, so a future migration that
+    rebuilds part_1_experement must re-create this trigger.
+    """
+    if schema_editor.connection.vendor != "sqlite":
+        return
+
+    schema_editor.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {TRIGGER_NAME}
+        AFTER UPDATE ON part_1_experement
+        FOR EACH ROW WHEN NEW.updated_at IS OLD.updated_at
+        BEGIN
+            UPDATE part_1_experement
+            SET updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now')
+            WHERE id = NEW.id;
+        END
+        """
+    )
+
+
+def drop_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute(f"DROP TRIGGER IF EXISTS {TRIGGER_NAME}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("part_1", "0004_frame_drop_ordering"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigger, drop_trigger),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0.1 on 2026-10-15 02:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('part_1', '0005_experiment_updated_at_trigger'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='frame',
+            index=models.Index(fields=['experiment', '-second', '-id'], name='frame_exp_sec_id_desc'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0.1 on 2026-10-15 02:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('part_1', '0006_frame_last_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='experiment',
+            index=models.Index(fields=['-created_at'], name='part_1_expe_created_6feab5_idx'),
+        ),
+    ]
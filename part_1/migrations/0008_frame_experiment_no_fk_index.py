@@ -0,0 +1,37 @@
+# Generated by Django 6.0.1 on 2026-10-15 03:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Auto-generated name of the ForeignKey's own index (same on SQLite and PostgreSQL).
+FK_INDEX_NAME = "part_1_frame_experiment_id_01f08407"
+
+
+class Migration(migrations.Migration):
+    """
+    frame_exp_sec_id_desc already starts with experiment_id, so the FK's single-column
+    index is dropped directly. A plain AlterField(db_index=False) would make SQLite
+    rebuild (copy) the whole frame table just to lose one index.
+    """
+
+    dependencies = [
+        ('part_1', '0007_experiment_created_at_index'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    sql=f'DROP INDEX IF EXISTS "{FK_INDEX_NAME}"',
+                    reverse_sql=f'CREATE INDEX "{FK_INDEX_NAME}" ON "part_1_frame" ("experiment_id")',
+                ),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='frame',
+                    name='experiment',
+                    field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='frames', to='part_1.experiment'),
+                ),
+            ],
+        ),
+    ]
@@ -1,6 +1,14 @@
-from django.db import models
+import csv
+import io
+from itertools import repeat
+from operator import itemgetter
+
+from django.db import connection, models, transaction
 from django.utils import timezone
 
+# Обов'язкові поля кадру в payload, витягуються одним викликом.
+_get_frame_fields = itemgetter("second", "temperature", "dif_pressure")
+
 
 class Experiment(models.Model):
     class Status(models.TextChoices):
@@ -43,14 +51,19 @@ class Experiment(models.Model):
         db_table = "part_1_experement"
         indexes = [
             models.Index(fields=["status", "created_at"]),
+            # Список "останні 50" (order_by("-created_at")[:50]) читається прямо з індексу.
+            models.Index(fields=["-created_at"]),
         ]
 
     def __str__(self):
         return f"{self.title} ({self.status})"
 
-    def save(self, *args, **kwargs):
-        self.updated_at = timezone.now()
-        return super().save(*args, **kwargs)
+    def save(self, *args, update_fields=None, **kwargs):
+        # save(update_fields=[...]) без updated_at не чіпає мітку в Python; на SQLite її
+        # оновлює тригер з міграції 0005 (він же покриває queryset.update() і raw SQL).
+        if update_fields is None or "updated_at" in update_fields:
+            self.updated_at = timezone.now()
+        return super().save(*args, update_fields=update_fields, **kwargs)
 
 
 class Frame(models.Model):
@@ -62,12 +75,15 @@ class Frame(models.Model):
     """
 
     # Кадр належить рівно одному експерименту.
+    # Окремий FK-індекс не потрібен: frame_exp_sec_id_desc починається з experiment
+    # і обслуговує і фільтр по експерименту, і каскадне видалення.
     experiment = models.ForeignKey(
         Experiment,
         on_delete=models.CASCADE,
         related_name="frames",
         null=True,
         blank=True,
+        db_index=False,
     )
 
     # Часова мітка/зміщення від початку експерименту (в секундах).
@@ -82,25 +98,41 @@ class Frame(models.Model):
     received_at = models.DateTimeField(default=timezone.now, editable=False)
 
     class Meta:
+        # Без default ordering: кожен запит сам задає order_by(), і невпорядковані
+        # вибірки (count, bulk-операції) не платять за сортування.
         indexes = [
-            models.Index(fields=["experiment", "second"]),
+            # "Останній кадр" (order_by("-second", "-id")), ліміт frames API і count по експерименту.
+            models.Index(fields=["experiment", "-second", "-id"], name="frame_exp_sec_id_desc"),
         ]
-        ordering = ["second", "id"]
 
     @classmethod
-    def bulk_create_from_payload(cls, payload, *, experiment, batch_size=1000):
+    def bulk_create_from_payload(cls, payload, *, experiment_id, batch_size=1000):
+        """
+        Приймає payload з API і масово вставляє записи Frame через bulk_insert_rows().
+
+        Формати payload і валідація описані в rows_from_payload().
+        Повертає кількість створених записів.
         """
-        Приймає payload з API і масово створює записи Frame через bulk_create().
+        rows = cls.rows_from_payload(payload, experiment_id=experiment_id)
+        return cls.bulk_insert_rows(rows, batch_size=batch_size)
+
+    @classmethod
+    def rows_from_payload(cls, payload, *, experiment_id):
+        """
+        Перевіряє payload з API і повертає кортежі у порядку INSERT_COLUMNS.
 
         Підтримувані формати:
         - {"frames": [{...}, {...}]}
         - [{...}, {...}]
 
         Важливо:
-        - bulk_create() не викликає model.save(), не запускає сигнали і не робить full_clean().
+        - Frame-об'єкти не створюються: значення збираються у три колонки (second/temperature/
+          dif_pressure), тому save(), сигнали і full_clean() не викликаються.
         - Значення приводяться до float; при некоректних даних кидається ValueError.
+        - received_at однаковий для всього payload (момент прийому запиту).
+        - Існування експерименту не перевіряється (лише FK id); це робить викликач.
         """
-        if experiment is None:
+        if experiment_id is None:
             raise ValueError("Experiment is required.")
 
         if isinstance(payload, dict):
@@ -111,33 +143,85 @@ class Frame(models.Model):
         if not isinstance(items, list) or not items:
             raise ValueError("Payload must contain a non-empty list of frames.")
 
-        frames = []
+        n = len(items)
+        seconds = [0.0] * n
+        temperatures = [0.0] * n
+        pressures = [0.0] * n
         for idx, item in enumerate(items):
             if not isinstance(item, dict):
                 raise ValueError(f"Frame at index {idx} must be an object.")
 
-            required = ("second", "temperature", "dif_pressure")
-            missing = [field for field in required if field not in item]
-            if missing:
-                raise ValueError(
-                    f"Frame at index {idx} missing required fields: {', '.join(missing)}."
-                )
-
             try:
-                frame = cls(
-                    experiment=experiment,
-                    second=float(item["second"]),
-                    temperature=float(item["temperature"]),
-                    dif_pressure=float(item["dif_pressure"]),
-                )
+                second, temperature, dif_pressure = _get_frame_fields(item)
+                seconds[idx] = float(second)
+                temperatures[idx] = float(temperature)
+                pressures[idx] = float(dif_pressure)
+            except KeyError as exc:
+                raise ValueError(
+                    f"Frame at index {idx} missing required field: {exc.args[0]}."
+                ) from None
             except (TypeError, ValueError):
                 raise ValueError(
                     f"Frame at index {idx} has invalid numeric values."
                 ) from None
 
-            frames.append(frame)
+        received_at = connection.ops.adapt_datetimefield_value(timezone.now())
+        return list(zip(repeat(experiment_id, n), seconds, temperatures, pressures, repeat(received_at, n)))
 
-        return cls.objects.bulk_create(frames, batch_size=batch_size)
+    # Порядок колонок для кортежів, які приймає bulk_insert_rows().
+    INSERT_COLUMNS = ("experiment_id", "second", "temperature", "dif_pressure", "received_at")
+    _insert_sql = None
+
+    @classmethod
+    def bulk_insert_rows(cls, rows, *, batch_size=None):
+        """
+        Масово вставляє готові кортежі у порядку INSERT_COLUMNS одним executemany().
+
+        Це "гарячий" шлях для poller'а: без створення Frame-об'єктів і без ORM.
+        received_at має бути вже підготовлений через connection.ops.adapt_datetimefield_value().
+        """
+        if not rows:
+            return 0
+        if connection.vendor == "postgresql":
+            return cls._copy_rows(rows)
+        if cls._insert_sql is None:
+            qn = connection.ops.quote_name
+            cls._insert_sql = "INSERT INTO {} ({}) VALUES ({})".format(
+                qn(cls._meta.db_table),
+                ", ".join(qn(col) for col in cls.INSERT_COLUMNS),
+                ", ".join(["%s"] * len(cls.INSERT_COLUMNS)),
+            )
+        step = batch_size or len(rows)
+        with transaction.atomic(), connection.cursor() as cursor:
+            for start in range(0, len(rows), step):
+                cursor.executemany(cls._insert_sql, rows[start : start + step])
+        return len(rows)
+
+    @classmethod
+    def _copy_rows(cls, rows):
+        """
+        PostgreSQL: ті самі кортежі, але через COPY FROM STDIN замість INSERT.
+
+        - psycopg 3: cursor.copy() + write_row(), типи адаптує драйвер.
+        - psycopg2: рядки пишуться у CSV-буфер у пам'яті і передаються в copy_expert().
+        """
+        qn = connection.ops.quote_name
+        sql = "COPY {} ({}) FROM STDIN".format(
+            qn(cls._meta.db_table),
+            ", ".join(qn(col) for col in cls.INSERT_COLUMNS),
+        )
+        with transaction.atomic(), connection.cursor() as cursor:
+            raw = cursor.cursor
+            if hasattr(raw, "copy"):
+                with raw.copy(sql) as copy:
+                    for row in rows:
+                        copy.write_row(row)
+            else:
+                buf = io.StringIO()
+                csv.writer(buf).writerows(rows)
+                buf.seek(0)
+                raw.copy_expert(sql + " WITH (FORMAT csv)", buf)
+        return len(rows)
 
     def __str__(self):
         # Людиночитний рядок для адмінки/логів.
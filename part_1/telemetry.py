@@ -1,17 +1,20 @@
 from __future__ import annotations
 
+import math
 import re
 import threading
 import time
 from dataclasses import dataclass
+from itertools import repeat
 
-from django.db import close_old_connections
+from django.db import close_old_connections, connection
+from django.utils import timezone
 
-from .arduino import ArduinoResult, _try_import_pyserial
+from .arduino import SERIAL_READ_TIMEOUT_S, ArduinoResult, _decode_lines, _LineReader, _try_import_pyserial
 from .models import Experiment, Frame
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class TelemetrySample:
     t_s: float
     rpm: float
@@ -20,24 +23,28 @@ class TelemetrySample:
     mosfet: int
 
 
-_DATA_RE = re.compile(
-    r"^OK\s+DATA\s+(?P<t_ms>\d+)\s+(?P<rpm>\d+)\s+(?P<p>\d+(?:\.\d+)?)\s+(?P<t>-?\d+(?:\.\d+)?)\s+(?P<m>\d+)\s*$",
-    re.IGNORECASE,
-)
+# Terminal reply detection on raw (already stripped) bytes: lastindex 1 => OK, 2 => ERR.
+_REPLY_RE = re.compile(rb"(?:(OK)|(ERR))", re.IGNORECASE)
+_REPLY_OK = 1
 
 
 def parse_read_all(line: str) -> TelemetrySample | None:
-    m = _DATA_RE.match(line.strip())
-    if not m:
+    # Expected: "OK DATA <t_ms> <rpm> <pressure_pa> <temp_c> <mosfet>"
+    parts = line.split()
+    if len(parts) != 7 or parts[0].upper() != "OK" or parts[1].upper() != "DATA":
         return None
     try:
-        t_s = float(m.group("t_ms")) / 1000.0
-        rpm = float(m.group("rpm"))
-        p = float(m.group("p"))
-        t = float(m.group("t"))
-        mosfet = int(m.group("m"))
+        t_s = float(parts[2]) / 1000.0
+        rpm = float(parts[3])
+        p = float(parts[4])
+        t = float(parts[5])
+        mosfet = int(parts[6])
     except ValueError:
         return None
+    # float() accepts "nan"/"inf" (MAX6675 gives NAN on an open thermocouple); SQLite would store
+    # NaN as NULL and the NOT NULL insert would fail the whole buffered batch.
+    if not (math.isfinite(t_s) and math.isfinite(rpm) and math.isfinite(p) and math.isfinite(t)):
+        return None
     return TelemetrySample(t_s=t_s, rpm=rpm, pressure_pa=p, temperature_c=t, mosfet=mosfet)
 
 
@@ -58,16 +65,51 @@ class ArduinoSession:
         self._boot_delay_s = float(boot_delay_s)
         self._lock = threading.Lock()
         self._ser = None
+        self._reader: _LineReader | None = None
+        # Set whenever no open is in progress; callers arriving during the boot delay wait on it.
+        self._ready = threading.Event()
+        self._ready.set()
+        self._opening = False
+        # Encoded wire form per command string; commands come from a small fixed set.
+        self._cmd_cache: dict[str, bytes] = {}
+
+    def _ensure_open(self, *, wait_s: float):
+        """
+        Must be called with self._lock held. The lock is released while the Arduino boots,
+        so other callers wait on self._ready (bounded by `wait_s`) instead of the mutex.
+        """
+        while self._ser is None:
+            if self._opening:
+                self._lock.release()
+                try:
+                    ready = self._ready.wait(wait_s)
+                finally:
+                    self._lock.acquire()
+                if not ready:
+                    raise TimeoutError("Serial port is still opening.")
+                continue
 
-    def _ensure_open(self):
-        if self._ser is not None:
-            return
-        ser = self._serial_mod.Serial(port=self._port, baudrate=self._baud, timeout=0.25)
-        # Arduino often resets on open.
-        if self._boot_delay_s > 0:
-            time.sleep(self._boot_delay_s)
-        ser.reset_input_buffer()
-        self._ser = ser
+            self._opening = True
+            self._ready.clear()
+            try:
+                ser = self._serial_mod.Serial(port=self._port, baudrate=self._baud, timeout=SERIAL_READ_TIMEOUT_S)
+                try:
+                    # Arduino often resets on open.
+                    if self._boot_delay_s > 0:
+                        self._lock.release()
+                        try:
+                            time.sleep(self._boot_delay_s)
+                        finally:
+                            self._lock.acquire()
+                    ser.reset_input_buffer()
+                except Exception:
+                    ser.close()
+                    raise
+                self._reader = _LineReader(ser)
+                self._ser = ser
+            finally:
+                self._opening = False
+                self._ready.set()
 
     def close(self):
         with self._lock:
@@ -76,35 +118,62 @@ class ArduinoSession:
                     self._ser.close()
                 finally:
                     self._ser = None
+                    self._reader = None
 
-    def request_one_line(self, *, command: str, timeout_s: float = 1.0) -> ArduinoResult:
+    def request_one_line(
+        self, *, command: str, timeout_s: float = 1.0, lock_timeout_s: float | None = None
+    ) -> ArduinoResult:
         """
         Send a command and wait for a single OK/ERR line.
+
+        With `lock_timeout_s`, gives up with a `busy` result if the port stays held (e.g. by the
+        poller) or is still opening for that long, instead of blocking.
         """
-        with self._lock:
+        wire = self._cmd_cache.get(command)
+        if wire is None:
+            wire = (command.strip() + "\n").encode("utf-8", errors="replace")
+            self._cmd_cache[command] = wire
+        return self.request_one_line_raw(wire, timeout_s=timeout_s, lock_timeout_s=lock_timeout_s)
+
+    def request_one_line_raw(
+        self, wire: bytes, *, timeout_s: float = 1.0, lock_timeout_s: float | None = None
+    ) -> ArduinoResult:
+        """
+        Same as request_one_line(), but `wire` is the already encoded command including the newline.
+        """
+        if lock_timeout_s is None:
+            self._lock.acquire()
+            open_wait_s = self._boot_delay_s + timeout_s
+        elif self._lock.acquire(timeout=lock_timeout_s):
+            open_wait_s = lock_timeout_s
+        else:
+            return ArduinoResult(ok=False, confirmed=False, response_lines=[], error="Serial port is busy.", busy=True)
+        try:
             try:
-                self._ensure_open()
-                assert self._ser is not None
-                self._ser.write((command.strip() + "\n").encode("utf-8", errors="replace"))
-                self._ser.flush()
-                t0 = time.monotonic()
-                lines: list[str] = []
-                while time.monotonic() - t0 < timeout_s:
-                    raw = self._ser.readline()
-                    if not raw:
-                        continue
-                    line = raw.decode("utf-8", errors="replace").strip()
-                    if not line:
-                        continue
-                    lines.append(line)
-                    up = line.upper()
-                    if up.startswith("ERR"):
-                        return ArduinoResult(ok=False, confirmed=False, response_lines=lines, error=line)
-                    if up.startswith("OK"):
-                        return ArduinoResult(ok=True, confirmed=True, response_lines=lines)
-                return ArduinoResult(ok=False, confirmed=False, response_lines=lines, error="Timeout waiting for response.")
-            except Exception as exc:
-                return ArduinoResult(ok=False, confirmed=False, response_lines=[], error=str(exc))
+                self._ensure_open(wait_s=open_wait_s)
+            except TimeoutError as exc:
+                return ArduinoResult(ok=False, confirmed=False, response_lines=[], error=str(exc), busy=True)
+            assert self._ser is not None
+            self._ser.write(wire)
+            self._ser.flush()
+            deadline = time.monotonic() + timeout_s
+            lines: list[bytes] = []
+            while (raw := self._reader.read_line(deadline)) is not None:
+                lines.append(raw)
+                m = _REPLY_RE.match(raw)
+                if m is None:
+                    continue
+                if m.lastindex == _REPLY_OK:
+                    return ArduinoResult(ok=True, confirmed=True, response_lines=_decode_lines(lines))
+                decoded = _decode_lines(lines)
+                return ArduinoResult(ok=False, confirmed=False, response_lines=decoded, error=decoded[-1])
+            return ArduinoResult(
+                ok=False, confirmed=False, response_lines=_decode_lines(lines), error="Timeout waiting for response."
+            )
+        except Exception as exc:
+            return ArduinoResult(ok=False, confirmed=False, response_lines=[], error=str(exc))
+        finally:
+            self._lock.release()
 
 
 _session_lock = threading.Lock()
@@ -113,24 +182,45 @@ _sessions: dict[tuple[str, int], ArduinoSession] = {}
 
 def get_session(*, port: str, baud_rate: int) -> ArduinoSession:
     key = (port, int(baud_rate))
+    # Fast path: dict reads are atomic, so only creation needs the lock.
+    sess = _sessions.get(key)
+    if sess is not None:
+        return sess
     with _session_lock:
         sess = _sessions.get(key)
-        if sess is not None:
-            return sess
-        sess = ArduinoSession(port=port, baud_rate=baud_rate)
-        _sessions[key] = sess
+        if sess is None:
+            sess = ArduinoSession(port=port, baud_rate=baud_rate)
+            _sessions[key] = sess
         return sess
 
 
+_READ_ALL_WIRE = b"READ_ALL\n"
+
+# How often a running poller re-reads the experiment status from the DB.
+_STATUS_CHECK_INTERVAL_S = 0.5
+# How often a poller lets Django drop stale/broken DB connections (close_old_connections).
+_CONN_GC_INTERVAL_S = 30.0
+
+
 class ExperimentPoller:
     def __init__(self, *, experiment_id: int, port: str, baud_rate: int, poll_hz: float = 20.0, batch_size: int = 20):
         self.experiment_id = int(experiment_id)
         self.port = port
         self.baud_rate = int(baud_rate)
         self.poll_hz = float(poll_hz)
+        if self.poll_hz <= 0:
+            raise ValueError("poll_hz must be > 0")
+        # Fixed at construction so the schedule doesn't depend on later changes to poll_hz.
+        self._period_s = 1.0 / self.poll_hz
         self.batch_size = int(batch_size)
         self._stop = threading.Event()
         self._thread = threading.Thread(target=self._run, name=f"poller-exp-{self.experiment_id}", daemon=True)
+        # Pending samples as preallocated parallel columns; self._n slots are filled.
+        self._t = [0.0] * self.batch_size
+        self._temp = [0.0] * self.batch_size
+        self._press = [0.0] * self.batch_size
+        self._ts: list = [None] * self.batch_size
+        self._n = 0
 
     def start(self):
         self._thread.start()
@@ -139,56 +229,80 @@ class ExperimentPoller:
         self._stop.set()
         self._thread.join(timeout=join_timeout_s)
 
+    def _flush(self) -> None:
+        n = self._n
+        if not n:
+            return
+        rows = list(zip(repeat(self.experiment_id, n), self._t, self._temp, self._press, self._ts))
+        try:
+            Frame.bulk_insert_rows(rows)
+        except Exception:
+            # If DB temporarily fails, keep only the newest samples and continue.
+            keep = min(n, 10)
+            for col in (self._t, self._temp, self._press, self._ts):
+                col[:keep] = col[n - keep : n]
+            self._n = keep
+            raise
+        self._n = 0
+
     def _run(self):
-        period_s = 1.0 / max(1.0, self.poll_hz)
+        period_s = self._period_s
         next_t = time.monotonic()
-        buf: list[Frame] = []
+        adapt_ts = connection.ops.adapt_datetimefield_value
+        status = None
+        last_status_check = float("-inf")
+        last_conn_gc = float("-inf")
+        sess = get_session(port=self.port, baud_rate=self.baud_rate)
 
         while not self._stop.is_set():
-            close_old_connections()
-
-            try:
-                exp = Experiment.objects.get(pk=self.experiment_id)
-            except Experiment.DoesNotExist:
-                break
-
-            if (exp.status or "").lower() != "running":
-                time.sleep(0.25)
+            now = time.monotonic()
+            if now - last_conn_gc > _CONN_GC_INTERVAL_S:
+                close_old_connections()
+                last_conn_gc = now
+
+            # Status only changes on user actions, so re-read it at a coarse interval
+            # instead of on every poll.
+            if now - last_status_check > _STATUS_CHECK_INTERVAL_S:
+                last_status_check = now
+                status = Experiment.objects.filter(pk=self.experiment_id).values_list("status", flat=True).first()
+                if status is None:
+                    break
+
+            if (status or "").lower() != "running":
+                self._stop.wait(0.25)
+                next_t = time.monotonic()
                 continue
 
-            sess = get_session(port=self.port, baud_rate=self.baud_rate)
-            res = sess.request_one_line(command="READ_ALL", timeout_s=0.8)
+            res = sess.request_one_line_raw(_READ_ALL_WIRE, timeout_s=0.8)
             if res.ok and res.confirmed and res.response_lines:
                 sample = parse_read_all(res.response_lines[-1])
                 if sample is not None:
-                    buf.append(
-                        Frame(
-                            experiment=exp,
-                            second=sample.t_s,
-                            temperature=sample.temperature_c,
-                            dif_pressure=sample.pressure_pa,
-                        )
-                    )
-
-            if len(buf) >= self.batch_size:
+                    n = self._n
+                    self._t[n] = sample.t_s
+                    self._temp[n] = sample.temperature_c
+                    self._press[n] = sample.pressure_pa
+                    self._ts[n] = adapt_ts(timezone.now())
+                    self._n = n + 1
+
+            if self._n >= self.batch_size:
                 try:
-                    Frame.objects.bulk_create(buf, batch_size=self.batch_size)
-                    buf = []
+                    self._flush()
                 except Exception:
-                    # If DB temporarily fails, keep buffer small and continue.
-                    buf = buf[-10:]
+                    pass
 
             next_t += period_s
-            sleep_s = next_t - time.monotonic()
-            if sleep_s > 0:
-                time.sleep(sleep_s)
-            else:
-                next_t = time.monotonic()
-
-        if buf:
+            lag = time.monotonic() - next_t
+            if lag > 0:
+                # Overran (slow reply or DB flush): skip the missed slots but stay on the
+                # original time grid instead of re-basing the schedule on "now".
+                next_t += period_s * (lag // period_s + 1)
+            # Waiting on the stop event (not time.sleep) lets stop() wake the thread at once.
+            self._stop.wait(max(0.0, next_t - time.monotonic()))
+
+        if self._n:
             try:
                 close_old_connections()
-                Frame.objects.bulk_create(buf, batch_size=min(len(buf), self.batch_size))
+                self._flush()
             except Exception:
                 pass
 
@@ -1,7 +1,22 @@
-from django.test import TestCase
+import datetime
+import gzip
+import json
+import os
+import queue
+import threading
+import time
+from unittest import mock, skipUnless
+
+from django.core.cache import cache
+from django.db import OperationalError, connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
 
+from . import ingest, views
 from .models import Experiment, Frame
+from .arduino import SERIAL_READ_TIMEOUT_S, _LineReader, _try_import_pyserial
+from .telemetry import ArduinoSession, ExperimentPoller, parse_read_all
 
 
 class FrameBatchIngestTests(TestCase):
@@ -13,10 +28,14 @@ class FrameBatchIngestTests(TestCase):
             {"second": 2, "temperature": 21.5, "dif_pressure": 0.2},
         ]
 
-        created = Frame.bulk_create_from_payload(payload, experiment=experiment)
+        created = Frame.bulk_create_from_payload(payload, experiment_id=experiment.id)
 
-        self.assertEqual(len(created), 2)
+        self.assertEqual(created, 2)
         self.assertEqual(Frame.objects.count(), 2)
+        self.assertEqual(
+            list(Frame.objects.order_by("second").values_list("experiment_id", "second", "temperature")),
+            [(experiment.id, 1.0, 20.5), (experiment.id, 2.0, 21.5)],
+        )
 
     def test_api_accepts_wrapped_payload(self):
         experiment = Experiment.objects.create(title="Test experiment")
@@ -38,6 +57,28 @@ class FrameBatchIngestTests(TestCase):
         self.assertEqual(response.json()["created"], 2)
         self.assertEqual(Frame.objects.count(), 2)
 
+    def test_api_returns_404_for_unknown_experiment(self):
+        response = self.client.post(
+            reverse("frame_batch_ingest", kwargs={"experiment_id": 999}),
+            data=[{"second": 1, "temperature": 20.5, "dif_pressure": 0.1}],
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(Frame.objects.count(), 0)
+
+    def test_api_rejects_oversized_body_before_parsing(self):
+        experiment = Experiment.objects.create(title="Test experiment")
+
+        with mock.patch.object(views, "FRAME_INGEST_MAX_BYTES", 10), self.assertNumQueries(0):
+            response = self.client.post(
+                reverse("frame_batch_ingest", kwargs={"experiment_id": experiment.id}),
+                data=[{"second": 1, "temperature": 20.5, "dif_pressure": 0.1}],
+                content_type="application/json",
+            )
+
+        self.assertEqual(response.status_code, 413)
+
     def test_api_rejects_invalid_payload(self):
         experiment = Experiment.objects.create(title="Test experiment")
 
@@ -51,3 +92,477 @@ class FrameBatchIngestTests(TestCase):
 
         self.assertEqual(response.status_code, 400)
         self.assertEqual(Frame.objects.count(), 0)
+
+    @override_settings(FRAME_INGEST_ASYNC=True)
+    def test_api_queues_rows_in_async_mode(self):
+        experiment = Experiment.objects.create(title="Test experiment")
+
+        payload = [{"second": 1, "temperature": 20.5, "dif_pressure": 0.1}]
+
+        with mock.patch("part_1.views.enqueue_frame_rows", return_value=True) as enqueue:
+            response = self.client.post(
+                reverse("frame_batch_ingest", kwargs={"experiment_id": experiment.id}),
+                data=payload,
+                content_type="application/json",
+            )
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()["queued"], 1)
+        (rows,), _ = enqueue.call_args
+        self.assertEqual(rows[0][:4], (experiment.id, 1.0, 20.5, 0.1))
+        self.assertEqual(Frame.objects.count(), 0)
+
+    def test_reports_missing_field(self):
+        experiment = Experiment.objects.create(title="Test experiment")
+
+        payload = [{"second": 1, "temperature": 20.5}]
+
+        with self.assertRaisesMessage(ValueError, "Frame at index 0 missing required field: dif_pressure."):
+            Frame.bulk_create_from_payload(payload, experiment_id=experiment.id)
+
+
+class FrameCopyInsertTests(TestCase):
+    rows = [(7, 1.0, 20.5, 0.1, "2026-10-15 00:00:00+00:00"), (7, 2.0, 21.5, 1e-07, "2026-10-15 00:00:01+00:00")]
+    copy_sql = (
+        'COPY "part_1_frame" ("experiment_id", "second", "temperature", "dif_pressure", "received_at") '
+        "FROM STDIN"
+    )
+
+    def insert_with(self, raw_cursor):
+        cursor = mock.MagicMock()
+        cursor.__enter__.return_value.cursor = raw_cursor
+        fake_connection = mock.Mock(vendor="postgresql", ops=connection.ops)
+        fake_connection.cursor.return_value = cursor
+        with mock.patch("part_1.models.connection", fake_connection):
+            return Frame.bulk_insert_rows(self.rows)
+
+    def test_psycopg3_writes_rows_through_copy(self):
+        raw = mock.Mock(spec=["copy"])
+        raw.copy.return_value = mock.MagicMock()
+        copy = raw.copy.return_value.__enter__.return_value
+
+        self.assertEqual(self.insert_with(raw), 2)
+
+        raw.copy.assert_called_once_with(self.copy_sql)
+        self.assertEqual([c.args[0] for c in copy.write_row.call_args_list], self.rows)
+
+    def test_psycopg2_streams_csv_through_copy_expert(self):
+        raw = mock.Mock(spec=["copy_expert"])
+        written = []
+        raw.copy_expert.side_effect = lambda sql, buf: written.append(buf.read())
+
+        self.assertEqual(self.insert_with(raw), 2)
+
+        raw.copy_expert.assert_called_once_with(self.copy_sql + " WITH (FORMAT csv)", mock.ANY)
+        self.assertEqual(
+            written,
+            ["7,1.0,20.5,0.1,2026-10-15 00:00:00+00:00\r\n7,2.0,21.5,1e-07,2026-10-15 00:00:01+00:00\r\n"],
+        )
+
+
+class FrameIngestWriterTests(TransactionTestCase):
+    def test_writer_coalesces_batches_and_drops_only_bad_ones(self):
+        experiment = Experiment.objects.create(title="Test experiment")
+        now = timezone.now()
+        good = [(experiment.id, float(s), 20.0, 0.1, now) for s in range(3)]
+        bad = [(experiment.id, None, 20.0, 0.1, now)]
+
+        work = queue.Queue()
+        for rows in (good[:2], bad, good[2:], None):
+            work.put(rows)
+
+        with mock.patch.object(ingest, "_queue", work), self.assertLogs("part_1.ingest", "WARNING") as logs:
+            writer = threading.Thread(target=ingest._run)
+            writer.start()
+            writer.join(5)
+
+        self.assertFalse(writer.is_alive())
+        self.assertEqual(
+            list(Frame.objects.order_by("second").values_list("second", flat=True)),
+            [0.0, 1.0, 2.0],
+        )
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn("batch of 1 rows", logs.output[0])
+
+
+class FrameIngestRetryTests(SimpleTestCase):
+    def run_writer(self, insert_effects):
+        work = queue.Queue()
+        work.put([(1, 0.0, 20.0, 0.1, None)] * 3)
+        work.put(None)
+        with mock.patch.object(ingest, "_queue", work), mock.patch.object(
+            ingest, "WRITE_RETRY_DELAYS_S", (0, 0)
+        ), mock.patch.object(Frame, "bulk_insert_rows", side_effect=insert_effects) as insert:
+            ingest._run()
+        return insert
+
+    def test_transient_error_is_retried(self):
+        with self.assertNoLogs("part_1.ingest"):
+            insert = self.run_writer([OperationalError("database is locked"), 3])
+
+        self.assertEqual(insert.call_count, 2)
+        self.assertEqual(insert.call_args_list[0], insert.call_args_list[1])
+
+    def test_rows_are_dropped_and_logged_after_retries(self):
+        with self.assertLogs("part_1.ingest", "ERROR") as logs:
+            insert = self.run_writer([OperationalError("database is locked")] * 3)
+
+        self.assertEqual(insert.call_count, 3)
+        self.assertIn("dropped 3 rows", logs.output[0])
+
+
+class ExperimentsListTests(TestCase):
+    def test_renders_list_with_one_validator_query(self):
+        for idx in range(3):
+            Experiment.objects.create(title=f"Experiment {idx}", description="Notes")
+
+        # One aggregate for ETag/Last-Modified, one for the rows.
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("experiments_list"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Experiment 2")
+        self.assertContains(response, "Notes", count=3)
+
+    def test_unchanged_list_is_304(self):
+        experiment = Experiment.objects.create(title="Experiment")
+        etag = self.client.get(reverse("experiments_list")).headers["ETag"]
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("experiments_list"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        experiment.delete()
+        response = self.client.get(reverse("experiments_list"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+class ExperimentDetailTests(TestCase):
+    def test_renders_in_one_query(self):
+        experiment = Experiment.objects.create(title="Test experiment", serial_port="/dev/ttyUSB0")
+        Frame.bulk_create_from_payload(
+            [{"second": 1, "temperature": 20.5, "dif_pressure": 0.1}],
+            experiment_id=experiment.id,
+        )
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("experiment_detail", kwargs={"experiment_id": experiment.id}))
+
+        self.assertContains(response, "/dev/ttyUSB0")
+
+
+class ExperimentActionTests(TestCase):
+    def post_action(self, experiment_id, action):
+        return self.client.post(
+            reverse("experiment_action", kwargs={"experiment_id": experiment_id}),
+            {"action": action},
+        )
+
+    def test_start_keeps_first_started_at(self):
+        experiment = Experiment.objects.create(title="Test experiment")
+
+        self.assertEqual(self.post_action(experiment.id, "start").status_code, 302)
+        experiment.refresh_from_db()
+        started_at = experiment.started_at
+        self.assertEqual(experiment.status, Experiment.Status.RUNNING)
+        self.assertIsNotNone(started_at)
+
+        self.post_action(experiment.id, "ignite")
+        experiment.refresh_from_db()
+        self.assertEqual(experiment.started_at, started_at)
+        self.assertIsNotNone(experiment.ignited_at)
+
+        self.post_action(experiment.id, "finish")
+        experiment.refresh_from_db()
+        self.assertEqual(experiment.status, Experiment.Status.FINISHED)
+        self.assertIsNotNone(experiment.ended_at)
+
+    def test_unknown_experiment_is_404(self):
+        self.assertEqual(self.post_action(999, "finish").status_code, 404)
+
+    def test_unknown_action_is_400(self):
+        experiment = Experiment.objects.create(title="Test experiment")
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.post_action(experiment.id, "explode").status_code, 400)
+
+
+class ExperimentStatusApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def get_status(self, experiment_id):
+        return self.client.get(reverse("experiment_status_api", kwargs={"experiment_id": experiment_id}))
+
+    def test_status_is_cached_and_refreshed_by_actions(self):
+        experiment = Experiment.objects.create(title="Test experiment")
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get_status(experiment.id).json()["experiment"]["status"], "draft")
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_status(experiment.id).json()["experiment"]["status"], "draft")
+
+        self.client.post(
+            reverse("experiment_action", kwargs={"experiment_id": experiment.id}),
+            {"action": "abort"},
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_status(experiment.id).json()["experiment"]["status"], "aborted")
+
+    def test_unknown_experiment_is_404(self):
+        self.assertEqual(self.get_status(999).status_code, 404)
+
+
+class SerialPortLockTests(TestCase):
+    def test_port_held_by_poller_fails_fast(self):
+        experiment = Experiment.objects.create(title="Test experiment", serial_port="/dev/ttyTEST0")
+        url = reverse("experiment_test_connection_api", kwargs={"experiment_id": experiment.id})
+        serial_mod = mock.Mock()
+        with mock.patch("part_1.telemetry._try_import_pyserial", return_value=serial_mod):
+            session = ArduinoSession(port="/dev/ttyTEST0", baud_rate=115200)
+
+        # The poller holds the session lock for the duration of its READ_ALL.
+        session._lock.acquire()
+        try:
+            with mock.patch.object(views, "PORT_LOCK_TIMEOUT_S", 0.01), mock.patch.object(
+                views, "get_session", return_value=session
+            ):
+                response = self.client.post(url)
+        finally:
+            session._lock.release()
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()["error"], "Serial port is busy.")
+        serial_mod.Serial.assert_not_called()
+
+
+class ExperimentSummaryApiTests(TestCase):
+    def test_reports_count_and_last_frame(self):
+        experiment = Experiment.objects.create(title="Test experiment")
+        Frame.bulk_create_from_payload(
+            [
+                {"second": 2, "temperature": 21.5, "dif_pressure": 0.2},
+                {"second": 1, "temperature": 20.5, "dif_pressure": 0.1},
+            ],
+            experiment_id=experiment.id,
+        )
+
+        # Experiment with its frame count, then the indexed last-frame seek.
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("experiment_summary_api", kwargs={"experiment_id": experiment.id}))
+
+        self.assertEqual(response.status_code, 200)
+        frames = response.json()["frames"]
+        self.assertEqual(frames["count"], 2)
+        self.assertEqual(frames["last"]["second"], 2.0)
+        self.assertEqual(frames["last"]["temperature"], 21.5)
+
+    def test_empty_experiment_has_no_last_frame(self):
+        experiment = Experiment.objects.create(title="Test experiment")
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("experiment_summary_api", kwargs={"experiment_id": experiment.id}))
+
+        self.assertEqual(response.json()["frames"], {"count": 0, "last": None})
+
+    def test_unknown_experiment_is_404(self):
+        self.assertEqual(
+            self.client.get(reverse("experiment_summary_api", kwargs={"experiment_id": 999})).status_code, 404
+        )
+
+
+class ExperimentFramesApiTests(TestCase):
+    def test_returns_latest_frames_oldest_first(self):
+        experiment = Experiment.objects.create(title="Test experiment")
+        Frame.bulk_create_from_payload(
+            [{"second": s, "temperature": 20 + s, "dif_pressure": 0.1 * s} for s in (3, 1, 2)],
+            experiment_id=experiment.id,
+        )
+
+        response = self.client.get(
+            reverse("experiment_frames_api", kwargs={"experiment_id": experiment.id}), {"limit": 2}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        frames = json.loads(b"".join(response.streaming_content))["frames"]
+        self.assertEqual([f["second"] for f in frames], [2.0, 3.0])
+        self.assertEqual(frames[-1]["temperature"], 23.0)
+
+    def test_gzips_when_accepted(self):
+        experiment = Experiment.objects.create(title="Test experiment")
+        Frame.bulk_create_from_payload(
+            [{"second": s, "temperature": 20, "dif_pressure": 0.1} for s in range(50)],
+            experiment_id=experiment.id,
+        )
+
+        response = self.client.get(
+            reverse("experiment_frames_api", kwargs={"experiment_id": experiment.id}),
+            HTTP_ACCEPT_ENCODING="gzip",
+        )
+
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        frames = json.loads(gzip.decompress(b"".join(response.streaming_content)))["frames"]
+        self.assertEqual(len(frames), 50)
+
+    def test_streams_across_chunks(self):
+        experiment = Experiment.objects.create(title="Test experiment")
+        Frame.bulk_create_from_payload(
+            [{"second": s, "temperature": 20, "dif_pressure": 0.1} for s in range(7)],
+            experiment_id=experiment.id,
+        )
+
+        with mock.patch.object(views, "FRAMES_STREAM_CHUNK", 3):
+            response = self.client.get(
+                reverse("experiment_frames_api", kwargs={"experiment_id": experiment.id})
+            )
+            frames = json.loads(b"".join(response.streaming_content))["frames"]
+
+        self.assertEqual([f["second"] for f in frames], [float(s) for s in range(7)])
+
+
+class ExperimentUpdatedAtTests(TestCase):
+    def test_queryset_update_bumps_updated_at(self):
+        experiment = Experiment.objects.create(title="Test experiment")
+        old = timezone.now() - datetime.timedelta(days=1)
+        Experiment.objects.filter(pk=experiment.pk).update(updated_at=old)
+
+        Experiment.objects.filter(pk=experiment.pk).update(status=Experiment.Status.RUNNING)
+
+        experiment.refresh_from_db()
+        self.assertGreater(experiment.updated_at, old)
+
+
+class ParseReadAllTests(SimpleTestCase):
+    def test_parses_data_line(self):
+        sample = parse_read_all("ok data 1500 120 950.5 -3.25 1\r\n")
+
+        self.assertIsNotNone(sample)
+        self.assertEqual(sample.t_s, 1.5)
+        self.assertEqual(sample.rpm, 120.0)
+        self.assertEqual(sample.pressure_pa, 950.5)
+        self.assertEqual(sample.temperature_c, -3.25)
+        self.assertEqual(sample.mosfet, 1)
+
+    def test_rejects_malformed_lines(self):
+        self.assertIsNone(parse_read_all("OK PONG"))
+        self.assertIsNone(parse_read_all("OK DATA 1500 120 950.5 -3.25"))
+        self.assertIsNone(parse_read_all("OK DATA 1500 120 bad -3.25 1"))
+        self.assertIsNone(parse_read_all("ERR DATA 1500 120 950.5 -3.25 1"))
+
+    def test_rejects_non_finite_values(self):
+        self.assertIsNone(parse_read_all("OK DATA 1500 120 950.5 nan 1"))
+        self.assertIsNone(parse_read_all("OK DATA 1500 120 inf -3.25 1"))
+
+
+class ExperimentPollerTests(SimpleTestCase):
+    def test_accepts_sub_hertz_rate(self):
+        poller = ExperimentPoller(experiment_id=1, port="/dev/null", baud_rate=115200, poll_hz=0.2)
+
+        self.assertEqual(poller._period_s, 5.0)
+
+    def test_rejects_non_positive_rate(self):
+        with self.assertRaises(ValueError):
+            ExperimentPoller(experiment_id=1, port="/dev/null", baud_rate=115200, poll_hz=0)
+
+
+@skipUnless(hasattr(os, "openpty") and _try_import_pyserial() is not None, "needs a pty and pyserial")
+class LineReaderTests(SimpleTestCase):
+    def setUp(self):
+        import tty  # POSIX-only, like openpty()
+
+        self.master, slave = os.openpty()
+        tty.setraw(slave)
+        self.ser = _try_import_pyserial().Serial(os.ttyname(slave), timeout=SERIAL_READ_TIMEOUT_S)
+        os.close(slave)
+        self.addCleanup(os.close, self.master)
+        self.addCleanup(self.ser.close)
+        self.reader = _LineReader(self.ser)
+
+    def test_keeps_partial_line_between_reads(self):
+        os.write(self.master, b"OK PO")
+        self.assertIsNone(self.reader.read_line(time.monotonic() + 0.1))
+
+        os.write(self.master, b"NG\r\n\r\n  \r\nOK DATA 1 2 3 4 0\r\n")
+        self.assertEqual(self.reader.read_line(time.monotonic() + 1), b"OK PONG")
+        self.assertEqual(self.reader.read_line(time.monotonic() + 1), b"OK DATA 1 2 3 4 0")
+
+    def test_returns_none_at_deadline(self):
+        start = time.monotonic()
+        self.assertIsNone(self.reader.read_line(start + 0.1))
+        self.assertLess(time.monotonic() - start, 0.5)
+
+
+class _FakePort:
+    def __init__(self, fail_reset=None):
+        self._r, self._w = os.pipe()
+        self._fail_reset = fail_reset
+        self.closed = False
+
+    def fileno(self):
+        return self._r
+
+    def reset_input_buffer(self):
+        if self._fail_reset is not None:
+            raise self._fail_reset
+
+    def close(self):
+        self.closed = True
+        os.close(self._r)
+        os.close(self._w)
+
+
+class ArduinoSessionOpenTests(SimpleTestCase):
+    def make_session(self, ports, boot_delay_s):
+        serial_mod = mock.Mock()
+        serial_mod.Serial.side_effect = ports
+        with mock.patch("part_1.telemetry._try_import_pyserial", return_value=serial_mod):
+            session = ArduinoSession(port="/dev/ttyTEST0", baud_rate=115200, boot_delay_s=boot_delay_s)
+        self.addCleanup(lambda: [port.close() for port in ports if not port.closed])
+        return session, serial_mod
+
+    def open_in_thread(self, session, wait_s):
+        errors = []
+
+        def run():
+            with session._lock:
+                try:
+                    session._ensure_open(wait_s=wait_s)
+                except Exception as exc:
+                    errors.append(exc)
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        # The opener releases the lock for the boot delay with _opening set.
+        deadline = time.monotonic() + 2
+        while not session._opening and time.monotonic() < deadline:
+            time.sleep(0.005)
+        return thread, errors
+
+    def test_waiter_times_out_while_port_is_opening(self):
+        port = _FakePort()
+        session, _ = self.make_session([port], boot_delay_s=0.3)
+        opener, errors = self.open_in_thread(session, wait_s=1)
+
+        with session._lock, self.assertRaisesMessage(TimeoutError, "Serial port is still opening."):
+            session._ensure_open(wait_s=0.01)
+
+        opener.join(2)
+        self.assertEqual(errors, [])
+        self.assertIs(session._ser, port)
+
+    def test_failed_open_wakes_waiter_which_retries(self):
+        failing = _FakePort(fail_reset=OSError("device vanished"))
+        working = _FakePort()
+        session, serial_mod = self.make_session([failing, working], boot_delay_s=0.2)
+        opener, errors = self.open_in_thread(session, wait_s=1)
+
+        with session._lock:
+            session._ensure_open(wait_s=1)
+
+        opener.join(2)
+        self.assertEqual([str(exc) for exc in errors], ["device vanished"])
+        self.assertTrue(failing.closed)
+        self.assertIs(session._ser, working)
+        self.assertEqual(serial_mod.Serial.call_count, 2)
+        self.assertFalse(session._opening)
+        self.assertTrue(session._ready.is_set())
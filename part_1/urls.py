@@ -31,6 +31,11 @@ urlpatterns = [
         views.experiment_test_connection_api,
         name="experiment_test_connection_api",
     ),
+    path(
+        "api/experiments/<int:experiment_id>/status/",
+        views.experiment_status_api,
+        name="experiment_status_api",
+    ),
     path(
         "api/experiments/<int:experiment_id>/summary/",
         views.experiment_summary_api,
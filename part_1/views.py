@@ -1,25 +1,73 @@
-import json
-import threading
-
-from django.http import JsonResponse
+from itertools import islice
+
+import orjson
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Func, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.utils import timezone
+from django.views.decorators.cache import cache_control
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_GET
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import condition, require_GET
 from django.views.decorators.http import require_POST
 
 from .telemetry import ensure_poller_running, get_session, stop_poller
 from .forms import ExperimentCreateForm
+from .ingest import enqueue_frame_rows
 from .models import Experiment, Frame
 
 
+def json_response(data, *, status: int = 200) -> HttpResponse:
+    # orjson encodes straight to bytes and is several times faster than json on numeric lists.
+    return HttpResponse(orjson.dumps(data), content_type="application/json", status=status)
+
+
+# Collectors poll the status once a second; the value is cached and refreshed on every
+# status change made through the views below. The timeout bounds staleness for edits made
+# elsewhere (e.g. the admin).
+STATUS_CACHE_TIMEOUT_S = 60
+
+
+def status_cache_key(experiment_id: int) -> str:
+    return f"exp:{experiment_id}:status"
+
+
 def empty_page(request):
     return redirect("experiments_list")
 
 
+def _experiments_list_state(request):
+    # Newest updated_at plus the row count: changes on any edit (the DB trigger keeps
+    # updated_at current), create or delete. Computed once per request for both validators.
+    state = getattr(request, "_experiments_list_state", None)
+    if state is None:
+        state = Experiment.objects.aggregate(last=Max("updated_at"), count=Count("id"))
+        request._experiments_list_state = state
+    return state
+
+
+def _experiments_list_etag(request):
+    state = _experiments_list_state(request)
+    last = state["last"]
+    return f"{state['count']}-{last.timestamp() if last else 0}"
+
+
+def _experiments_list_last_modified(request):
+    return _experiments_list_state(request)["last"]
+
+
 @require_GET
+@cache_control(max_age=2, private=True)
+@condition(etag_func=_experiments_list_etag, last_modified_func=_experiments_list_last_modified)
 def experiments_list(request):
-    experiments = Experiment.objects.order_by("-created_at")[:50]
+    # Only the columns the list template renders (description included: deferring it
+    # would cost one extra query per card).
+    experiments = Experiment.objects.only("id", "title", "description", "status", "created_at").order_by(
+        "-created_at"
+    )[:50]
     return render(
         request,
         "part_1/experiments_list.html",
@@ -41,7 +89,11 @@ def experiment_create(request):
 
 @require_GET
 def experiment_detail(request, experiment_id: int):
-    experiment = get_object_or_404(Experiment, pk=experiment_id)
+    # Frames are loaded by the page via summary/frames APIs, so only the header fields are needed.
+    experiment = get_object_or_404(
+        Experiment.objects.only("id", "title", "description", "status", "created_at", "serial_port", "baud_rate"),
+        pk=experiment_id,
+    )
     return render(
         request,
         "part_1/experiment_detail.html",
@@ -49,57 +101,83 @@ def experiment_detail(request, experiment_id: int):
     )
 
 
+# action -> (target status, timestamps stamped on first use, whether the poller runs afterwards)
+_ACTIONS = {
+    "start": (Experiment.Status.RUNNING, ("started_at",), True),
+    "ignite": (Experiment.Status.RUNNING, ("ignited_at", "started_at"), True),
+    "finish": (Experiment.Status.FINISHED, ("ended_at",), False),
+    "abort": (Experiment.Status.ABORTED, ("ended_at",), False),
+}
+
+
 @require_POST
 def experiment_action(request, experiment_id: int):
-    experiment = get_object_or_404(Experiment, pk=experiment_id)
     action = (request.POST.get("action") or "").strip().lower()
+    spec = _ACTIONS.get(action)
+    if spec is None:
+        return json_response({"status": "error", "error": "Unknown action."}, status=400)
+    status, stamps, poll = spec
+
+    # A single UPDATE; Coalesce keeps the first timestamp if it is already set.
     now = timezone.now()
+    experiments = Experiment.objects.filter(pk=experiment_id)
+    _update_or_404(
+        experiments,
+        status=status,
+        updated_at=now,
+        **{field: Coalesce(field, Value(now)) for field in stamps},
+    )
+    cache.set(status_cache_key(experiment_id), status, STATUS_CACHE_TIMEOUT_S)
 
-    if action == "start":
-        if experiment.started_at is None:
-            experiment.started_at = now
-        experiment.status = Experiment.Status.RUNNING
-        experiment.save()
-        ensure_poller_running(experiment)
-        return redirect("experiment_detail", experiment_id=experiment.id)
+    if poll:
+        ensure_poller_running(experiments.only("id", "status", "serial_port", "baud_rate").get())
+    else:
+        stop_poller(experiment_id)
+    return redirect("experiment_detail", experiment_id=experiment_id)
 
-    if action == "ignite":
-        if experiment.ignited_at is None:
-            experiment.ignited_at = now
-        if experiment.started_at is None:
-            experiment.started_at = now
-        experiment.status = Experiment.Status.RUNNING
-        experiment.save()
-        ensure_poller_running(experiment)
-        return redirect("experiment_detail", experiment_id=experiment.id)
 
-    if action == "finish":
-        if experiment.ended_at is None:
-            experiment.ended_at = now
-        experiment.status = Experiment.Status.FINISHED
-        experiment.save()
-        stop_poller(experiment.id)
-        return redirect("experiment_detail", experiment_id=experiment.id)
+def _update_or_404(queryset, **fields):
+    if not queryset.update(**fields):
+        raise Http404("Experiment not found.")
 
-    if action == "abort":
-        if experiment.ended_at is None:
-            experiment.ended_at = now
-        experiment.status = Experiment.Status.ABORTED
-        experiment.save()
-        stop_poller(experiment.id)
-        return redirect("experiment_detail", experiment_id=experiment.id)
 
-    return JsonResponse({"status": "error", "error": "Unknown action."}, status=400)
+@require_GET
+def experiment_status_api(request, experiment_id: int):
+    # Cheap probe for collectors: no experiment serialization, no frame queries.
+    key = status_cache_key(experiment_id)
+    status = cache.get(key)
+    if status is None:
+        status = Experiment.objects.filter(pk=experiment_id).values_list("status", flat=True).first()
+        if status is None:
+            raise Http404("Experiment not found.")
+        cache.set(key, status, STATUS_CACHE_TIMEOUT_S)
+    return json_response({"status": "ok", "experiment": {"id": experiment_id, "status": status}})
 
 
 @require_GET
 def experiment_summary_api(request, experiment_id: int):
-    experiment = get_object_or_404(Experiment, pk=experiment_id)
-
-    qs = Frame.objects.filter(experiment=experiment).order_by("-second", "-id")
-    last = qs.first()
+    # The frame count rides along with the experiment row as a correlated subquery
+    # (COUNT without GROUP BY), so the view costs two queries: experiment+count, last frame.
+    frame_count = (
+        Frame.objects.filter(experiment_id=OuterRef("pk"))
+        .order_by()
+        .annotate(n=Func(F("id"), function="COUNT"))
+        .values("n")
+    )
+    experiment = get_object_or_404(Experiment.objects.annotate(frame_count=Subquery(frame_count)), pk=experiment_id)
+
+    # The last row is a single seek on the (experiment, -second, -id) index.
+    count = experiment.frame_count
+    last = None
+    if count:
+        last = (
+            Frame.objects.filter(experiment_id=experiment.id)
+            .order_by("-second", "-id")
+            .values("second", "temperature", "dif_pressure", "received_at")
+            .first()
+        )
 
-    return JsonResponse(
+    return json_response(
         {
             "status": "ok",
             "experiment": {
@@ -116,13 +194,13 @@ def experiment_summary_api(request, experiment_id: int):
                 "baud_rate": experiment.baud_rate,
             },
             "frames": {
-                "count": Frame.objects.filter(experiment=experiment).count(),
+                "count": count,
                 "last": (
                     {
-                        "second": last.second,
-                        "temperature": last.temperature,
-                        "dif_pressure": last.dif_pressure,
-                        "received_at": last.received_at.isoformat() if last.received_at else None,
+                        "second": last["second"],
+                        "temperature": last["temperature"],
+                        "dif_pressure": last["dif_pressure"],
+                        "received_at": last["received_at"].isoformat() if last["received_at"] else None,
                     }
                     if last
                     else None
@@ -132,26 +210,56 @@ def experiment_summary_api(request, experiment_id: int):
     )
 
 
+# Rows fetched from the DB cursor and encoded per chunk, so memory stays flat for large limits.
+FRAMES_STREAM_CHUNK = 500
+
+
+def _stream_frames(rows):
+    yield b'{"status":"ok","frames":['
+    rows = iter(rows)
+    sep = b""
+    while chunk := list(islice(rows, FRAMES_STREAM_CHUNK)):
+        encoded = orjson.dumps(
+            [
+                {"second": second, "temperature": temperature, "dif_pressure": dif_pressure}
+                for second, temperature, dif_pressure in chunk
+            ]
+        )
+        # Drop the list brackets so chunks join into one array.
+        yield sep + encoded[1:-1]
+        sep = b","
+    yield b"]}"
+
+
 @require_GET
+@gzip_page
 def experiment_frames_api(request, experiment_id: int):
-    experiment = get_object_or_404(Experiment, pk=experiment_id)
+    experiment = get_object_or_404(Experiment.objects.only("id"), pk=experiment_id)
     try:
         limit = int(request.GET.get("limit", "200"))
     except ValueError:
         limit = 200
     limit = max(1, min(limit, 2000))
 
-    frames = list(
-        Frame.objects.filter(experiment=experiment)
-        .order_by("-second", "-id")[:limit]
-        .values("second", "temperature", "dif_pressure")
+    # Newest `limit` ids via the (experiment, -second, -id) index, streamed oldest-first for the chart.
+    frames = Frame.objects.filter(experiment_id=experiment.id)
+    newest_ids = frames.order_by("-second", "-id").values("id")[:limit]
+    rows = (
+        frames.filter(id__in=Subquery(newest_ids))
+        .order_by("second", "id")
+        .values_list("second", "temperature", "dif_pressure")
+        .iterator(chunk_size=FRAMES_STREAM_CHUNK)
     )
-    frames.reverse()
+    return StreamingHttpResponse(_stream_frames(rows), content_type="application/json")
+
 
-    return JsonResponse({"status": "ok", "frames": frames})
+# Commands give up after this long if the port is held (e.g. by the poller) and answer 503,
+# instead of tying up a worker behind a hung serial line.
+PORT_LOCK_TIMEOUT_S = 1.0
 
 
-_serial_lock = threading.Lock()
+def _port_busy_response() -> HttpResponse:
+    return json_response({"status": "error", "error": "Serial port is busy."}, status=503)
 
 
 @require_POST
@@ -164,28 +272,29 @@ def experiment_command_api(request, experiment_id: int):
     experiment = get_object_or_404(Experiment, pk=experiment_id)
 
     try:
-        payload = json.loads(request.body.decode("utf-8"))
-    except (UnicodeDecodeError, json.JSONDecodeError):
-        return JsonResponse({"status": "error", "error": "Invalid JSON body."}, status=400)
+        payload = orjson.loads(request.body)
+    except orjson.JSONDecodeError:
+        return json_response({"status": "error", "error": "Invalid JSON body."}, status=400)
 
     cmd = (payload.get("command") or "").strip().lower()
     if cmd not in {"start", "stop"}:
-        return JsonResponse({"status": "error", "error": "Unknown command."}, status=400)
+        return json_response({"status": "error", "error": "Unknown command."}, status=400)
 
     if not experiment.serial_port:
-        return JsonResponse(
+        return json_response(
             {"status": "error", "error": "Experiment serial_port is not configured."},
             status=400,
         )
 
     wire_cmd = "START" if cmd == "start" else "STOP"
 
-    with _serial_lock:
-        sess = get_session(port=experiment.serial_port, baud_rate=experiment.baud_rate)
-        res = sess.request_one_line(command=wire_cmd, timeout_s=2.5)
+    sess = get_session(port=experiment.serial_port, baud_rate=experiment.baud_rate)
+    res = sess.request_one_line(command=wire_cmd, timeout_s=2.5, lock_timeout_s=PORT_LOCK_TIMEOUT_S)
+    if res.busy:
+        return _port_busy_response()
 
     if not (res.ok and res.confirmed):
-        return JsonResponse(
+        return json_response(
             {
                 "status": "error",
                 "confirmed": False,
@@ -204,15 +313,17 @@ def experiment_command_api(request, experiment_id: int):
             experiment.ignited_at = now
         experiment.status = Experiment.Status.RUNNING
         experiment.save()
+        cache.set(status_cache_key(experiment.id), experiment.status, STATUS_CACHE_TIMEOUT_S)
         ensure_poller_running(experiment)
     else:
         if experiment.ended_at is None:
             experiment.ended_at = now
         experiment.status = Experiment.Status.ABORTED
         experiment.save()
+        cache.set(status_cache_key(experiment.id), experiment.status, STATUS_CACHE_TIMEOUT_S)
         stop_poller(experiment.id)
 
-    return JsonResponse(
+    return json_response(
         {
             "status": "ok",
             "confirmed": True,
@@ -228,17 +339,18 @@ def experiment_command_api(request, experiment_id: int):
 def experiment_test_connection_api(request, experiment_id: int):
     experiment = get_object_or_404(Experiment, pk=experiment_id)
     if not experiment.serial_port:
-        return JsonResponse(
+        return json_response(
             {"status": "error", "error": "Experiment serial_port is not configured."},
             status=400,
         )
 
-    with _serial_lock:
-        sess = get_session(port=experiment.serial_port, baud_rate=experiment.baud_rate)
-        res = sess.request_one_line(command="PING", timeout_s=1.5)
+    sess = get_session(port=experiment.serial_port, baud_rate=experiment.baud_rate)
+    res = sess.request_one_line(command="PING", timeout_s=1.5, lock_timeout_s=PORT_LOCK_TIMEOUT_S)
+    if res.busy:
+        return _port_busy_response()
 
     if not (res.ok and res.confirmed):
-        return JsonResponse(
+        return json_response(
             {
                 "status": "error",
                 "confirmed": False,
@@ -248,40 +360,65 @@ def experiment_test_connection_api(request, experiment_id: int):
             status=502,
         )
 
-    return JsonResponse(
+    return json_response(
         {"status": "ok", "confirmed": True, "response_lines": res.response_lines},
         status=200,
     )
 
 
+# Rejected from the Content-Length header alone, before the body is read or parsed.
+FRAME_INGEST_MAX_BYTES = 2_000_000
+
+
 @csrf_exempt
 @require_POST
 def frame_batch_ingest(request, experiment_id: int):
     try:
-        payload = json.loads(request.body.decode("utf-8"))
-    except (UnicodeDecodeError, json.JSONDecodeError):
-        return JsonResponse(
+        content_length = int(request.META.get("CONTENT_LENGTH") or 0)
+    except ValueError:
+        content_length = 0
+    if content_length > FRAME_INGEST_MAX_BYTES:
+        return json_response(
+            {"status": "error", "error": "Payload too large."},
+            status=413,
+        )
+
+    try:
+        payload = orjson.loads(request.body)
+    except orjson.JSONDecodeError:
+        return json_response(
             {"status": "error", "error": "Invalid JSON body."},
             status=400,
         )
 
-    try:
-        experiment = Experiment.objects.get(pk=experiment_id)
-    except Experiment.DoesNotExist:
-        return JsonResponse(
+    # Rows only need the FK id; an EXISTS probe is cheaper than loading the experiment.
+    if not Experiment.objects.filter(pk=experiment_id).exists():
+        return json_response(
             {"status": "error", "error": "Experiment not found."},
             status=404,
         )
 
     try:
-        created = Frame.bulk_create_from_payload(payload, experiment=experiment)
+        rows = Frame.rows_from_payload(payload, experiment_id=experiment_id)
     except ValueError as exc:
-        return JsonResponse(
+        return json_response(
             {"status": "error", "error": str(exc)},
             status=400,
         )
 
-    return JsonResponse(
-        {"status": "ok", "created": len(created)},
+    if settings.FRAME_INGEST_ASYNC:
+        if not enqueue_frame_rows(rows):
+            return json_response(
+                {"status": "error", "error": "Ingest queue is full."},
+                status=503,
+            )
+        return json_response(
+            {"status": "ok", "queued": len(rows)},
+            status=202,
+        )
+
+    created = Frame.bulk_insert_rows(rows)
+    return json_response(
+        {"status": "ok", "created": created},
         status=201,
     )
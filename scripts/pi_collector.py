@@ -4,6 +4,8 @@ Raspberry Pi telemetry collector:
 - Opens Arduino serial once (important for high-frequency polling).
 - Polls Arduino using READ_ALL.
 - Sends frames to Django endpoint /api/experiments/<id>/frames/batch/ in batches.
+- All HTTP runs on background threads (batch uploader, status probe), so server latency
+  or outages never stall sampling; the sampling loop only reads serial.
 
 Environment variables:
 - EXPERIMENT_ID (required)
@@ -12,15 +14,47 @@ Environment variables:
 - BAUD_RATE (optional; default: 115200)
 - POLL_HZ (optional; default: 20)
 - BATCH_SIZE (optional; default: 20)
+- PIPELINE_DEPTH (optional; default: 1; READ_ALL requests sent per serial write, max 7).
+  The firmware answers a whole burst in one loop() pass from cached sensor readings, so
+  depth > 1 yields clustered near-duplicate rows; only raise it when the link round trip,
+  not sensor freshness, is the bottleneck.
 """
 
 from __future__ import annotations
 
-import json
+import math
 import os
+import queue
+import re
+import threading
 import time
-import urllib.error
-import urllib.request
+from collections import deque
+
+import orjson
+import requests
+from requests.adapters import HTTPAdapter
+
+_PING = b"PING\n"
+_READ_ALL = b"READ_ALL\n"
+
+# The Arduino RX buffer is 64 bytes; 7 x _READ_ALL (9 bytes) is the most we can queue
+# without the board dropping input while it is busy sampling.
+MAX_PIPELINE_DEPTH = 7
+
+# Encoded batches waiting for the uploader thread; when full, sealed batches wait in a local
+# backlog that drops the oldest ones beyond LOCAL_BACKLOG_BATCHES (bounded memory on long outages).
+UPLOAD_QUEUE_BATCHES = 50
+LOCAL_BACKLOG_BATCHES = 1000
+UPLOAD_RETRY_S = 1.0
+STATUS_CHECK_INTERVAL_S = 1.0
+# 4xx answers that will not change on retry (bad payload, unknown experiment, body too large).
+_DROP_STATUS_CODES = frozenset({400, 404, 413})
+
+_FRAMES_HEAD = b'{"frames":['
+_FRAME_FMT = b'{"second":%r,"temperature":%r,"dif_pressure":%r},'
+
+# Expected: b"OK DATA <t_ms> <rpm> <pressure_pa> <temp_c> <mosfet>"; matched on the raw serial bytes.
+_READ_ALL_RE = re.compile(rb"\s*OK\s+DATA\s+(\S+)\s+(\S+)\s+(\S+)\s+(\S+)\s+(\S+)", re.IGNORECASE)
 
 
 def _env_int(name: str, default: int) -> int:
@@ -43,43 +77,88 @@ def _env_float(name: str, default: float) -> float:
         return default
 
 
-def _http_json(method: str, url: str, payload: dict | None = None, timeout_s: float = 5.0) -> dict:
+def _http_session() -> requests.Session:
+    # One keep-alive connection pool for all status checks and batch POSTs.
+    session = requests.Session()
+    session.headers.update({"Accept": "application/json"})
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2, max_retries=0)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _http_json(
+    session: requests.Session,
+    method: str,
+    url: str,
+    payload: dict | bytes | None = None,
+    timeout_s: float = 5.0,
+) -> dict:
     data = None
-    headers = {"Accept": "application/json"}
+    headers = None
     if payload is not None:
-        data = json.dumps(payload).encode("utf-8")
-        headers["Content-Type"] = "application/json"
+        # Pre-encoded bodies (the frame batches) are sent as-is.
+        data = payload if isinstance(payload, bytes) else orjson.dumps(payload)
+        headers = {"Content-Type": "application/json"}
 
-    req = urllib.request.Request(url=url, data=data, method=method, headers=headers)
-    with urllib.request.urlopen(req, timeout=timeout_s) as resp:
-        raw = resp.read()
-    return json.loads(raw.decode("utf-8"))
+    resp = session.request(method, url, data=data, headers=headers, timeout=timeout_s)
+    resp.raise_for_status()
+    return orjson.loads(resp.content)
 
 
-def _parse_read_all(line: str) -> dict | None:
-    # Expected: "OK DATA <t_ms> <rpm> <pressure_pa> <temp_c> <mosfet>"
-    parts = line.strip().split()
-    if len(parts) < 7:
-        return None
-    if parts[0].upper() != "OK" or parts[1].upper() != "DATA":
+def _parse_read_all(line: bytes) -> dict | None:
+    m = _READ_ALL_RE.match(line)
+    if m is None:
         return None
 
+    # float()/int() accept ASCII bytes directly, so the line is never decoded.
+    t_ms, rpm, pressure_pa, temp_c, mosfet = m.groups()
     try:
-        t_ms = float(parts[2])
-        rpm = float(parts[3])
-        pressure_pa = float(parts[4])
-        temp_c = float(parts[5])
-        mosfet = int(parts[6])
+        return {
+            "t_s": float(t_ms) * 0.001,
+            "rpm": float(rpm),
+            "pressure_pa": float(pressure_pa),
+            "temp_c": float(temp_c),
+            "mosfet": int(mosfet),
+        }
     except ValueError:
         return None
 
-    return {
-        "t_s": t_ms / 1000.0,
-        "rpm": rpm,
-        "pressure_pa": pressure_pa,
-        "temp_c": temp_c,
-        "mosfet": mosfet,
-    }
+
+def _upload_loop(session: requests.Session, ingest_url: str, batches: queue.Queue) -> None:
+    # Runs in its own thread so slow or failing POSTs never stall serial sampling.
+    # Batches are posted in order; a failed batch is retried until the server accepts it,
+    # unless the server rejects it outright, in which case it is dropped.
+    while True:
+        body = batches.get()
+        while True:
+            try:
+                resp = _http_json(session, "POST", ingest_url, body, timeout_s=5.0)
+                if (resp or {}).get("status") == "ok":
+                    break
+            except requests.HTTPError as exc:
+                if exc.response is not None and exc.response.status_code in _DROP_STATUS_CODES:
+                    break
+            except (requests.RequestException, orjson.JSONDecodeError):
+                pass
+            time.sleep(UPLOAD_RETRY_S)
+
+
+def _status_loop(session: requests.Session, status_url: str, running: threading.Event) -> None:
+    # Mirrors the experiment status into `running` once a second; the sampling loop only reads it.
+    while True:
+        try:
+            # Cached server-side; much cheaper than the full summary.
+            resp = _http_json(session, "GET", status_url, None, timeout_s=3.0)
+            status = ((resp or {}).get("experiment") or {}).get("status") or ""
+            if str(status).strip().lower() == "running":
+                running.set()
+            else:
+                running.clear()
+        except Exception:
+            # If server is down temporarily, keep last known state and retry later.
+            pass
+        time.sleep(STATUS_CHECK_INTERVAL_S)
 
 
 def main() -> int:
@@ -91,15 +170,19 @@ def main() -> int:
     baud_rate = _env_int("BAUD_RATE", 115200)
     poll_hz = max(1.0, _env_float("POLL_HZ", 20.0))
     batch_size = max(1, _env_int("BATCH_SIZE", 20))
+    depth = min(MAX_PIPELINE_DEPTH, max(1, _env_int("PIPELINE_DEPTH", 1)))
 
     summary_url = f"{server_base}/api/experiments/{experiment_id}/summary/"
+    status_url = f"{server_base}/api/experiments/{experiment_id}/status/"
     ingest_url = f"{server_base}/api/experiments/{experiment_id}/frames/batch/"
 
+    session = _http_session()
+
     serial_port = (os.getenv("SERIAL_PORT") or "").strip()
     if not serial_port:
         # Pull port/baud from DB via summary API to reduce manual config.
         try:
-            summary = _http_json("GET", summary_url, None, timeout_s=5.0)
+            summary = _http_json(session, "GET", summary_url, None, timeout_s=5.0)
             exp = (summary or {}).get("experiment") or {}
             serial_port = (exp.get("serial_port") or "").strip()
             baud_rate = int(exp.get("baud_rate") or baud_rate)
@@ -115,9 +198,28 @@ def main() -> int:
     except Exception:
         raise SystemExit("pyserial is required (pip install pyserial).")
 
-    frames: list[dict] = []
-    last_status_check = 0.0
-    running = False
+    # The uploader gets its own session: requests.Session is not shared across threads.
+    uploads: queue.Queue[bytes] = queue.Queue(maxsize=UPLOAD_QUEUE_BATCHES)
+    threading.Thread(
+        target=_upload_loop,
+        args=(_http_session(), ingest_url, uploads),
+        name="frame-uploader",
+        daemon=True,
+    ).start()
+
+    # Frames are appended as ready JSON fragments; the body is closed only when sending.
+    frames = bytearray(_FRAMES_HEAD)
+    frame_count = 0
+    backlog: deque[bytes] = deque(maxlen=LOCAL_BACKLOG_BATCHES)
+    # Only log while the experiment is RUNNING; the flag is kept current by the status thread,
+    # which takes over the startup session (the main thread makes no more HTTP calls).
+    running = threading.Event()
+    threading.Thread(
+        target=_status_loop,
+        args=(session, status_url, running),
+        name="status-probe",
+        daemon=True,
+    ).start()
 
     # Keep one serial connection open for max polling rate.
     with serial.Serial(port=serial_port, baudrate=baud_rate, timeout=0.2) as ser:
@@ -126,55 +228,54 @@ def main() -> int:
         ser.reset_input_buffer()
 
         # Basic handshake (optional)
-        ser.write(b"PING\n")
-        ser.flush()
+        ser.write(_PING)
         _ = ser.readline()
 
-        period_s = 1.0 / poll_hz
+        # Average row rate stays POLL_HZ, but with depth > 1 the rows of one tick arrive a few ms
+        # apart (same cached sensor values), followed by a gap of one period.
+        period_s = depth / poll_hz
+        read_all_burst = _READ_ALL * depth
         next_t = time.monotonic()
 
         while True:
-            now = time.monotonic()
-
-            # Periodically check experiment status; only log when RUNNING.
-            if now - last_status_check > 1.0:
-                last_status_check = now
-                try:
-                    summary = _http_json("GET", summary_url, None, timeout_s=3.0)
-                    status = ((summary or {}).get("experiment") or {}).get("status") or ""
-                    running = str(status).strip().lower() == "running"
-                except Exception:
-                    # If server is down temporarily, keep last known state and retry later.
-                    pass
-
-            if not running:
-                time.sleep(0.25)
+            if not running.is_set():
+                running.wait(0.25)
                 continue
 
-            # Poll Arduino
-            ser.write(b"READ_ALL\n")
-            ser.flush()
-            line = ser.readline().decode("utf-8", errors="replace").strip()
-            parsed = _parse_read_all(line)
-            if parsed is not None:
-                frames.append(
-                    {
-                        "second": parsed["t_s"],
-                        "temperature": parsed["temp_c"],
-                        "dif_pressure": parsed["pressure_pa"],
-                    }
-                )
-
-            # Send batch
-            if len(frames) >= batch_size:
-                payload = {"frames": frames}
+            # Poll Arduino: queue several READ_ALL requests, then collect the replies.
+            # Every reply carries its own t_ms, so a late line from a previous burst is still valid.
+            # No flush(): on POSIX it is tcdrain(), an extra syscall that waits for the UART,
+            # and the readline() below waits for the reply anyway.
+            ser.write(read_all_burst)
+            replies = 0
+            while replies < depth:
+                line = ser.readline()
+                if not line:
+                    # Timed out; whatever is still in flight is picked up next tick.
+                    break
+                parsed = _parse_read_all(line)
+                if parsed is not None:
+                    replies += 1
+                    second, temperature, dif_pressure = parsed["t_s"], parsed["temp_c"], parsed["pressure_pa"]
+                    # repr() of nan/inf is not valid JSON; the server would reject the whole batch.
+                    if math.isfinite(second) and math.isfinite(temperature) and math.isfinite(dif_pressure):
+                        frames += _FRAME_FMT % (second, temperature, dif_pressure)
+                        frame_count += 1
+
+            # Seal the batch: swap the trailing comma for the closing brackets.
+            if frame_count >= batch_size:
+                backlog.append(bytes(frames[:-1]) + b"]}")
+                del frames[len(_FRAMES_HEAD) :]
+                frame_count = 0
+
+            # Hand sealed batches to the uploader in order; if it is behind (server down?),
+            # they stay in the bounded backlog until the next tick.
+            while backlog:
                 try:
-                    resp = _http_json("POST", ingest_url, payload, timeout_s=5.0)
-                    if (resp or {}).get("status") == "ok":
-                        frames = []
-                except (urllib.error.URLError, TimeoutError, json.JSONDecodeError):
-                    # Keep frames; retry on next iteration.
-                    pass
+                    uploads.put_nowait(backlog[0])
+                except queue.Full:
+                    break
+                backlog.popleft()
 
             # Rate limit
             next_t += period_s